@@ -1,10 +1,29 @@
+import os
+import sys
+import multiprocessing
+
 from paddlelite.lite import *
 
-opt=Opt()
-opt.set_model_file(r"output_inference/yolov3_mobilenet_v3_arm/model.pdmodel")
-opt.set_param_file(r"output_inference/yolov3_mobilenet_v3_arm/model.pdiparams")
-opt.set_optimize_out(r"output_inference/yolov3_mobilenet_v3_arm/model")
-opt.set_valid_places(r"arm")
-opt.set_model_type(r"naive_buffer")
-opt.print_supported_ops()
-opt.run()
\ No newline at end of file
+
+def convert(model_dir):
+    opt=Opt()
+    opt.set_model_file(os.path.join(model_dir, "model.pdmodel"))
+    opt.set_param_file(os.path.join(model_dir, "model.pdiparams"))
+    opt.set_optimize_out(os.path.join(model_dir, "model"))
+    opt.set_valid_places(r"arm")
+    opt.set_model_type(r"naive_buffer")
+    opt.run()
+
+
+if __name__ == '__main__':
+    # usage: python convertLite.py [model_dir ...]
+    model_dirs = sys.argv[1:] or [r"output_inference/yolov3_mobilenet_v3_arm"]
+    # the op table is hundreds of lines, only dump it when asked for
+    if os.environ.get("LITE_DEBUG"):
+        Opt().print_supported_ops()
+    if len(model_dirs) == 1:
+        convert(model_dirs[0])
+    else:
+        # Opt is CPU bound graph optimization, convert models in parallel processes
+        with multiprocessing.Pool(min(len(model_dirs), os.cpu_count() or 1)) as p:
+            p.map(convert, model_dirs)
@@ -1,3 +1,4 @@
+import math
 import random
 import os
 
@@ -6,26 +7,21 @@ data_root_dir = "fireOrigin"
 annotate_root_dir = "annotations"
 image_root_dir = "images"
 
-itemList = []
-for ip in os.listdir(os.path.join(data_root_dir, image_root_dir)):
-    ap = ip.replace("jpg", "xml")
-    print(ip + " " + ap)
-    itemList.append(
-        (os.path.join(data_root_dir, image_root_dir, ip), os.path.join(data_root_dir, annotate_root_dir, ap)))
+img_dir = os.path.join(data_root_dir, image_root_dir)
+ann_dir = os.path.join(data_root_dir, annotate_root_dir)
 
-ratio = 0.9
-random.shuffle(itemList)
-trainf = open(os.path.join("trainval.txt"), "w")
-testf = open(os.path.join("test.txt"), "w")
-
-for i, item in enumerate(itemList):
-    img, annot = item[0], item[1]
-    writeText = img + ' ' + annot + '\n'
+with os.scandir(img_dir) as it:
+    itemList = [(os.path.join(img_dir, entry.name),
+                 os.path.join(ann_dir, os.path.splitext(entry.name)[0] + ".xml"))
+                for entry in it if entry.is_file(follow_symlinks=False)]
 
-    if i < ratio * len(itemList):
-        trainf.write(writeText)
-    else:
-        testf.write(writeText)
-
-trainf.close()
-testf.close()
+ratio = 0.9
+# shuffle indices instead of the tuples, the seeded order is unchanged
+idx = list(range(len(itemList)))
+random.shuffle(idx)
+# the first ceil(ratio * N) items go to trainval, the rest to test
+cut = math.ceil(ratio * len(idx))
+with open("trainval.txt", "w", buffering=1 << 20) as trainf:
+    trainf.writelines("{} {}\n".format(*itemList[i]) for i in idx[:cut])
+with open("test.txt", "w", buffering=1 << 20) as testf:
+    testf.writelines("{} {}\n".format(*itemList[i]) for i in idx[cut:])
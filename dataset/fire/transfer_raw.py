@@ -4,10 +4,13 @@ raw_images_dir = "rawImg"
 fire_origin_dir = "fireOrigin/images"
 index = 600
 
-for img in os.listdir(raw_images_dir):
-    print(img)
-    os.rename(os.path.join(raw_images_dir, img), os.path.join(raw_images_dir, str(index) + '.jpg'))
-    index += 1
+# snapshot the listing once, the renames below land in the same directory
+with os.scandir(raw_images_dir) as it:
+    entries = [entry.name for entry in it if entry.is_file(follow_symlinks=False)]
 
-for img in os.listdir(raw_images_dir):
-    print(img)
+# stage through temporary names so a target never collides with a source
+for i, name in enumerate(entries):
+    os.rename(os.path.join(raw_images_dir, name), os.path.join(raw_images_dir, ".tmp_{}.jpg".format(i)))
+
+for i in range(len(entries)):
+    os.rename(os.path.join(raw_images_dir, ".tmp_{}.jpg".format(i)), os.path.join(raw_images_dir, str(index + i) + '.jpg'))
@@ -1,29 +1,95 @@
 import os
+import sys
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 vocFolder = "../fire"
 cocoTrainFolder = "train_fire"
 cocoValFolder = "val_fire"
 
-trainTxt = open(os.path.join(vocFolder, "trainval.txt"), 'r')
-testTxt = open(os.path.join(vocFolder, "test.txt"), 'r')
+# widen the user-space buffer used when the in-kernel copy is unavailable
+shutil.COPY_BUFSIZE = 1024 * 1024
 
-for trainf in os.listdir(cocoTrainFolder):
-    os.remove(os.path.join(cocoTrainFolder, trainf))
 
-for valf in os.listdir(cocoValFolder):
-    os.remove(os.path.join(cocoValFolder, valf))
+def fastcopy(src, dst):
+    """
+    Copy the bytes of src to dst without the file permissions.
+    On Linux the transfer is done in kernel via os.copy_file_range
+    (or os.sendfile on older kernels), otherwise it falls back to
+    shutil.copyfile.
+    """
+    if not sys.platform.startswith('linux'):
+        shutil.copyfile(src, dst)
+        return
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        infd, outfd = fsrc.fileno(), fdst.fileno()
+        size = os.fstat(infd).st_size
+        offset = 0
+        use_range = hasattr(os, 'copy_file_range')
+        while offset < size:
+            if use_range:
+                try:
+                    sent = os.copy_file_range(infd, outfd, size - offset,
+                                              offset, offset)
+                except OSError:
+                    # e.g. EXDEV on old kernels, retry with sendfile
+                    use_range = False
+                    os.lseek(outfd, offset, os.SEEK_SET)
+                    continue
+            else:
+                sent = os.sendfile(outfd, infd, offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
 
-for line in trainTxt.readlines():
-    context = line.split(' ')
-    fileName = context[0].split('\\')[-1]
-    vocPath = os.path.join(vocFolder, context[0])
-    cocoPath = os.path.join(cocoTrainFolder, fileName)
-    shutil.copy(vocPath, cocoPath)
 
-for line in testTxt.readlines():
-    context = line.split(' ')
-    fileName = context[0].split('\\')[-1]
-    vocPath = os.path.join(vocFolder, context[0])
-    cocoPath = os.path.join(cocoValFolder, fileName)
-    shutil.copy(vocPath, cocoPath)
\ No newline at end of file
+def linkcopy(src, dst):
+    """
+    Hard link dst to src, which moves no data. An existing dst is
+    replaced like a copy would overwrite it, and any filesystem that
+    refuses the link falls back to fastcopy.
+    """
+    try:
+        os.unlink(dst)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(src, dst)
+    except OSError:
+        fastcopy(src, dst)
+
+
+def copy_func(dest_folder):
+    # a hard link is only possible within the same filesystem
+    if os.stat(vocFolder).st_dev == os.stat(dest_folder).st_dev:
+        return linkcopy
+    return fastcopy
+
+
+def mirror(txt_path, dest_folder, executor):
+    """
+    Copy every image listed in txt_path into dest_folder.
+    """
+    copy = copy_func(dest_folder)
+
+    def tasks(txt):
+        join, basename = os.path.join, os.path.basename
+        for line in txt:
+            # list files are written on Windows, normalize the separators
+            srcRel = line.partition(' ')[0].replace('\\', '/')
+            if not srcRel:
+                continue
+            yield join(vocFolder, srcRel), join(dest_folder, basename(srcRel))
+
+    with open(txt_path, 'r') as txt:
+        list(executor.map(lambda p: copy(*p), tasks(txt)))
+
+
+for d in (cocoTrainFolder, cocoValFolder):
+    shutil.rmtree(d, ignore_errors=True)
+    os.makedirs(d, exist_ok=True)
+
+# copies are I/O bound and independent, keep many of them in flight
+with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as ex:
+    mirror(os.path.join(vocFolder, "trainval.txt"), cocoTrainFolder, ex)
+    mirror(os.path.join(vocFolder, "test.txt"), cocoValFolder, ex)
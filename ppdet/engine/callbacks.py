@@ -23,6 +23,9 @@ import datetime
 import six
 import copy
 import json
+import weakref
+import collections
+from concurrent.futures import ThreadPoolExecutor
 
 import paddle
 import paddle.distributed as dist
@@ -39,6 +42,134 @@ __all__ = [
 ]
 
 
+class _StagingPool(object):
+    """
+    Host tensors that checkpoint state_dicts are staged into, kept across
+    saves and keyed by (dtype, shape), so that every best epoch does not
+    allocate and free a host copy of the model. GPU tensors are staged in
+    pinned memory by non-blocking copies, and a single synchronize waits
+    for all of them.
+    """
+
+    def __init__(self):
+        self._free = collections.defaultdict(list)
+        # whether a non-blocking GPU copy is queued since the last sync
+        self._gpu_copies = False
+
+    def _copy_into(self, host, tensor):
+        # only copies from a GPU place are made non-blocking, any other
+        # device is copied synchronously
+        if tensor.place.is_gpu_place():
+            self._gpu_copies = True
+            host.copy_(tensor, False)
+        else:
+            host.copy_(tensor, True)
+
+    def _copy(self, tensor):
+        free = self._free.get((tensor.dtype, tuple(tensor.shape)))
+        if free:
+            host = free.pop()
+            self._copy_into(host, tensor)
+        elif tensor.place.is_gpu_place():
+            self._gpu_copies = True
+            host = tensor.pin_memory(blocking=False)
+        else:
+            host = tensor.cpu()
+            if host is tensor:
+                host = tensor.detach().clone()
+        # paddle.save records the parameter names of a state_dict, keep
+        # them instead of the names of the copies
+        host.name = tensor.name
+        return host
+
+    def _stage(self, obj):
+        if isinstance(obj, dict):
+            return type(obj)((k, self._stage(v)) for k, v in obj.items())
+        if isinstance(obj, list):
+            return [self._stage(v) for v in obj]
+        if isinstance(obj, paddle.Tensor):
+            return self._copy(obj)
+        return obj
+
+    def _synchronize(self):
+        # a GPU build may still train on CPU, where there is nothing to
+        # wait for and synchronize() rejects the CPU place
+        if self._gpu_copies:
+            self._gpu_copies = False
+            paddle.device.synchronize()
+
+    def stage(self, obj):
+        """
+        Copy the tensors of a (nested) state_dict to host memory, so that
+        the copy is not modified by training while it is written.
+        """
+        staged = self._stage(obj)
+        self._synchronize()
+        return staged
+
+    def refill(self, staged, state_dict):
+        """
+        Copy a flat state_dict into the host tensors staged from it before.
+        """
+        for host, value in zip(staged.values(), state_dict.values()):
+            self._copy_into(host, value)
+        self._synchronize()
+        return staged
+
+    def release(self, obj):
+        """
+        Give the host tensors of a staged state_dict back to the pool.
+        """
+        if isinstance(obj, dict):
+            obj = list(obj.values())
+        if isinstance(obj, list):
+            for v in obj:
+                self.release(v)
+        elif isinstance(obj, paddle.Tensor):
+            self._free[(obj.dtype, tuple(obj.shape))].append(obj)
+
+
+# layout of a model state_dict recorded on its first save: the parameter
+# names in order, and the host tensors their values are copied into
+_SavePlan = collections.namedtuple('_SavePlan', ['names', 'buffers'])
+
+
+def _reader_batch_sizes(cfg):
+    """
+    Map each mode to the batch_size of its reader config.
+    """
+    return {
+        mode: cfg.get('{}Reader'.format(mode.capitalize()), {}).get(
+            'batch_size')
+        for mode in ['train', 'eval', 'test']
+    }
+
+
+def _get_mota(metric, map_res):
+    """
+    Overall MOTA of a MOT metric, parsed from its summary string if the
+    metric does not provide the value itself.
+    """
+    mota = getattr(metric, 'mota', None)
+    if mota is None:
+        mota = float(map_res.split(' ')[-9].rstrip("%")) / 100
+    return mota
+
+
+def _metric_results(status, metric):
+    """
+    get_results() of metric, computed once per evaluation and shared by
+    all callbacks through status. ComposeCallback drops the cache when an
+    epoch begins and when it ends, the trainers reset the metrics right
+    after.
+    """
+    cache = status.setdefault('_metric_results_cache', {})
+    res = cache.get(id(metric))
+    if res is None:
+        res = cache[id(metric)] = metric.get_results()
+    return res
+
+
 class Callback(object):
     def __init__(self, model):
         self.model = model
@@ -48,6 +179,11 @@ class Callback(object):
         elif isinstance(log_ranks, int):
             self.log_ranks = [log_ranks]
         self.logger = setup_logger('ppdet.engine.callbacks',log_ranks=self.log_ranks)
+        # world size and rank do not change during a run, query them once
+        self._world_size = dist.get_world_size()
+        self._rank = dist.get_rank()
+        self._is_main = self._world_size < 2 or self._rank == 0
+        self._is_log_rank = self._world_size < 2 or self._rank in self.log_ranks
 
     def on_step_begin(self, status):
         pass
@@ -75,66 +211,95 @@ class ComposeCallback(object):
             assert isinstance(
                 c, Callback), "callback should be subclass of Callback"
         self._callbacks = callbacks
+        # bind the hooks once, they are dispatched on every step
+        self._on_step_begin = [c.on_step_begin for c in callbacks]
+        self._on_step_end = [c.on_step_end for c in callbacks]
+        self._on_epoch_begin = [c.on_epoch_begin for c in callbacks]
+        self._on_epoch_end = [c.on_epoch_end for c in callbacks]
+        self._on_train_begin = [c.on_train_begin for c in callbacks]
+        self._on_train_end = [c.on_train_end for c in callbacks]
 
     def on_step_begin(self, status):
-        for c in self._callbacks:
-            c.on_step_begin(status)
+        for fn in self._on_step_begin:
+            fn(status)
 
     def on_step_end(self, status):
-        for c in self._callbacks:
-            c.on_step_end(status)
+        for fn in self._on_step_end:
+            fn(status)
 
     def on_epoch_begin(self, status):
-        for c in self._callbacks:
-            c.on_epoch_begin(status)
+        # the metrics are reset or updated from here on
+        status.pop('_metric_results_cache', None)
+        for fn in self._on_epoch_begin:
+            fn(status)
 
     def on_epoch_end(self, status):
-        for c in self._callbacks:
-            c.on_epoch_end(status)
+        for fn in self._on_epoch_end:
+            fn(status)
+        # the results are only valid until the metrics are reset, which
+        # the trainers do right after this
+        status.pop('_metric_results_cache', None)
 
     def on_train_begin(self, status):
-        for c in self._callbacks:
-            c.on_train_begin(status)
+        for fn in self._on_train_begin:
+            fn(status)
 
     def on_train_end(self, status):
-        for c in self._callbacks:
-            c.on_train_end(status)
+        for fn in self._on_train_end:
+            fn(status)
 
 
 class LogPrinter(Callback):
     def __init__(self, model):
         super(LogPrinter, self).__init__(model)
+        # the train log template only depends on the step counts,
+        # it is rebuilt only when they change
+        self._train_fmt = None
+        self._train_fmt_key = None
+        self._batch_size = _reader_batch_sizes(self.model.cfg)
+        # the memory peaks are only for display, refresh them at most
+        # every max(log_iter, 50) steps
+        self._print_mem_info = paddle.device.is_compiled_with_cuda() and \
+            self.model.cfg.get("print_mem_info", True)
+        self._last_mem_log_step = -1
+        self._cached_mem = ('', '')
 
     def on_step_end(self, status):
-        
-        if dist.get_world_size() < 2 or dist.get_rank() in self.log_ranks:
+        if self._is_log_rank:
             mode = status['mode']
             if mode == 'train':
-                epoch_id = status['epoch_id']
                 step_id = status['step_id']
+                # build the log line only on logging steps
+                if step_id % self.model.cfg.log_iter != 0:
+                    return
+                epoch_id = status['epoch_id']
                 steps_per_epoch = status['steps_per_epoch']
                 training_staus = status['training_staus']
                 batch_time = status['batch_time']
                 data_time = status['data_time']
 
                 epoches = self.model.cfg.epoch
-                batch_size = self.model.cfg['{}Reader'.format(mode.capitalize(
-                ))]['batch_size']
+                batch_size = self._batch_size[mode]
 
                 logs = training_staus.log()
-                space_fmt = ':' + str(len(str(steps_per_epoch))) + 'd'
-                if step_id % self.model.cfg.log_iter == 0:
-                    eta_steps = (epoches - epoch_id) * steps_per_epoch - step_id
-                    eta_sec = eta_steps * batch_time.global_avg
-                    eta_str = str(datetime.timedelta(seconds=int(eta_sec)))
-                    ips = float(batch_size) / batch_time.avg
-                    max_mem_reserved_str = ""
-                    max_mem_allocated_str = ""
-                    print_mem_info = self.model.cfg.get("print_mem_info", True)
-                    if paddle.device.is_compiled_with_cuda() and print_mem_info:
-                        max_mem_reserved_str = f", max_mem_reserved: {paddle.device.cuda.max_memory_reserved() // (1024 ** 2)} MB"
-                        max_mem_allocated_str = f", max_mem_allocated: {paddle.device.cuda.max_memory_allocated() // (1024 ** 2)} MB"
-                    fmt = ' '.join([
+                eta_steps = (epoches - epoch_id) * steps_per_epoch - step_id
+                eta_sec = eta_steps * batch_time.global_avg
+                eta_str = str(datetime.timedelta(seconds=int(eta_sec)))
+                ips = float(batch_size) / batch_time.avg
+                if self._print_mem_info:
+                    global_step = epoch_id * steps_per_epoch + step_id
+                    mem_interval = max(self.model.cfg.log_iter, 50)
+                    if self._last_mem_log_step < 0 or \
+                            global_step < self._last_mem_log_step or \
+                            global_step - self._last_mem_log_step >= mem_interval:
+                        self._cached_mem = (
+                            f", max_mem_reserved: {paddle.device.cuda.max_memory_reserved() // (1024 ** 2)} MB",
+                            f", max_mem_allocated: {paddle.device.cuda.max_memory_allocated() // (1024 ** 2)} MB")
+                        self._last_mem_log_step = global_step
+                max_mem_reserved_str, max_mem_allocated_str = self._cached_mem
+                if self._train_fmt_key != steps_per_epoch:
+                    space_fmt = ':' + str(len(str(steps_per_epoch))) + 'd'
+                    self._train_fmt = ' '.join([
                         'Epoch: [{}]',
                         '[{' + space_fmt + '}/{}]',
                         'learning_rate: {lr:.6f}',
@@ -146,26 +311,27 @@ class LogPrinter(Callback):
                         '{max_mem_reserved_str}'
                         '{max_mem_allocated_str}'
                     ])
-                    fmt = fmt.format(
-                        epoch_id,
-                        step_id,
-                        steps_per_epoch,
-                        lr=status['learning_rate'],
-                        meters=logs,
-                        eta=eta_str,
-                        btime=str(batch_time),
-                        dtime=str(data_time),
-                        ips=ips,
-                        max_mem_reserved_str=max_mem_reserved_str,
-                        max_mem_allocated_str=max_mem_allocated_str)
-                    self.logger.info(fmt)
+                    self._train_fmt_key = steps_per_epoch
+                fmt = self._train_fmt.format(
+                    epoch_id,
+                    step_id,
+                    steps_per_epoch,
+                    lr=status['learning_rate'],
+                    meters=logs,
+                    eta=eta_str,
+                    btime=str(batch_time),
+                    dtime=str(data_time),
+                    ips=ips,
+                    max_mem_reserved_str=max_mem_reserved_str,
+                    max_mem_allocated_str=max_mem_allocated_str)
+                self.logger.info(fmt)
             if mode == 'eval':
                 step_id = status['step_id']
                 if step_id % 100 == 0:
                     self.logger.info("Eval iter: {}".format(step_id))
 
     def on_epoch_end(self, status):
-        if dist.get_world_size() < 2 or dist.get_rank() == 0:
+        if self._is_main:
             mode = status['mode']
             if mode == 'eval':
                 sample_num = status['sample_num']
@@ -184,31 +350,70 @@ class Checkpointer(Callback):
             self.weight = self.model.model.student_model
         else:
             self.weight = self.model.model
-        
+        # checkpoints are written by a single background worker, so that
+        # two saves never write the same file at the same time
+        self._io_pool = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+        self._staging = _StagingPool()
+        # host snapshots read by the pending save
+        self._staged = []
+
+    def wait_pending(self):
+        """
+        Block until the checkpoint being written in background is on disk.
+        """
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+            # the written snapshots can be refilled by the next save
+            staged, self._staged = self._staged, []
+            for obj in staged:
+                self._staging.release(obj)
+
+    def _stage(self, obj):
+        """
+        Snapshot a (nested) state_dict to host memory, so that training can
+        keep updating it while the background worker writes it.
+        """
+        self.wait_pending()
+        staged = self._staging.stage(obj)
+        self._staged.append(staged)
+        return staged
+
+    def _save_root(self, save_name):
+        if self.uniform_output_enabled:
+            return os.path.join(self.save_dir, save_name)
+        return self.save_dir
+
+    def _save_async(self, save_func, *args, **kwargs):
+        self.wait_pending()
+        self._pending = self._io_pool.submit(save_func, *args, **kwargs)
+
     def on_epoch_end(self, status):
         # Checkpointer only performed during training
         mode = status['mode']
         epoch_id = status['epoch_id']
         weight = None
         save_name = None
-        if dist.get_world_size() < 2 or dist.get_rank() == 0:
+        if self._is_main:
             end_epoch = self.model.cfg.epoch
             save_name = str(epoch_id) if epoch_id != end_epoch - 1 else "model_final"
             if mode == 'train':
-                end_epoch = self.model.cfg.epoch
-                if (
-                        epoch_id + 1
-                ) % self.model.cfg.snapshot_epoch == 0 or epoch_id == end_epoch - 1:
-                    save_name = str(
-                        epoch_id) if epoch_id != end_epoch - 1 else "model_final"
-                    weight = self.weight.state_dict()
+                # nothing to save on non-snapshot epochs
+                if (epoch_id + 1) % self.model.cfg.snapshot_epoch != 0 \
+                        and epoch_id != end_epoch - 1:
+                    return
+                weight = self.weight.state_dict()
             elif mode == 'eval':
+                save_best_model = status.get('save_best_model', False)
+                epoch_save_name = save_name
+                epoch_metric = None
                 for metric in self.model._metrics:
-                    map_res = metric.get_results()
+                    map_res = _metric_results(status, metric)
                     if "MOTA" in map_res:
                         key = "mot"
                         eval_func = "mota"
-                        epoch_ap = float(map_res.split(' ')[-9].rstrip("%")) / 100
+                        epoch_ap = _get_mota(metric, map_res)
                     else:
                         eval_func = "ap"
                         if 'pose3d' in map_res:
@@ -231,16 +436,13 @@ class Checkpointer(Callback):
                             epoch_ap = 0.0
                         else:
                             epoch_ap = map_res[key][0]
-                    epoch_metric = {
-                        'metric': abs(epoch_ap),
-                        'epoch': epoch_id + 1
-                    }
-                    save_path = os.path.join(os.path.join(self.save_dir, save_name) if self.uniform_output_enabled else self.save_dir, f"{save_name}.pdstates")
-                    paddle.save(epoch_metric, save_path)
-                    if self.uniform_output_enabled:
-                        save_model_info(epoch_metric, self.save_dir, save_name)
-                        update_train_results(self.model.cfg, save_name, epoch_metric, done_flag=epoch_id + 1 == self.model.cfg.epoch, ema=self.model.use_ema)
-                    if 'save_best_model' in status and status['save_best_model']:
+                    # the epoch states record the first metric
+                    if epoch_metric is None:
+                        epoch_metric = {
+                            'metric': abs(epoch_ap),
+                            'epoch': epoch_id + 1
+                        }
+                    if save_best_model:
                         if epoch_ap >= self.best_ap:
                             self.best_ap = epoch_ap
                             save_name = 'best_model'
@@ -249,50 +451,83 @@ class Checkpointer(Callback):
                                 'metric': abs(self.best_ap),
                                 'epoch': epoch_id + 1
                             }
-                            save_path = os.path.join(os.path.join(self.save_dir, save_name) if self.uniform_output_enabled else self.save_dir, "best_model.pdstates")
+                            save_path = os.path.join(self._save_root(save_name), "best_model.pdstates")
                             paddle.save(best_metric, save_path)
                             if self.uniform_output_enabled:
                                 save_model_info(best_metric, self.save_dir, save_name)
                                 update_train_results(self.model.cfg, save_name, best_metric, done_flag=epoch_id + 1 == self.model.cfg.epoch, ema=self.model.use_ema)
                         logger.info("Best test {} {} is {:0.3f}.".format(
                             key, eval_func, abs(self.best_ap)))
+                if epoch_metric is not None:
+                    save_path = os.path.join(self._save_root(epoch_save_name), f"{epoch_save_name}.pdstates")
+                    paddle.save(epoch_metric, save_path)
+                    if self.uniform_output_enabled:
+                        save_model_info(epoch_metric, self.save_dir, epoch_save_name)
+                        update_train_results(self.model.cfg, epoch_save_name, epoch_metric, done_flag=epoch_id + 1 == self.model.cfg.epoch, ema=self.model.use_ema)
             if weight:
+                # snapshot on the main thread, training keeps updating the
+                # parameters and optimizer states while the files are written.
+                weight = self._stage(weight)
+                optimizer_state = self._stage(self.model.optimizer.state_dict())
+                save_root = self._save_root(save_name)
                 if self.model.use_ema:
+                    # status['weight'] is the trainer's deep copy of the
+                    # non-EMA weights, still on the device
+                    model_weight = self._stage(status['weight'])
                     exchange_save_model = status.get('exchange_save_model',
                                                      False)
                     if not exchange_save_model:
                         # save model and ema_model
-                        save_model(
-                            status['weight'],
-                            self.model.optimizer,
-                            os.path.join(self.save_dir, save_name) if self.uniform_output_enabled else self.save_dir,
+                        self._save_async(
+                            save_model,
+                            model_weight,
+                            optimizer_state,
+                            save_root,
                             save_name,
                             epoch_id + 1,
                             ema_model=weight)
                         if self.uniform_output_enabled:
-                            self.model.export(output_dir=os.path.join(self.save_dir, save_name, "inference"), for_fd=True)
-                            gc.collect()
+                            self.model.export(output_dir=os.path.join(save_root, "inference"), for_fd=True)
+                            # only sweep the young garbage left by export, a
+                            # full collection stalls training
+                            gc.collect(generation=0)
                     else:
                         # save model(student model) and ema_model(teacher model)
                         # in DenseTeacher SSOD, the teacher model will be higher,
                         # so exchange when saving pdparams
-                        student_model = status['weight']  # model
+                        student_model = model_weight  # model
                         teacher_model = weight  # ema_model
-                        save_model(
+                        self._save_async(
+                            save_model,
                             teacher_model,
-                            self.model.optimizer,
+                            optimizer_state,
                             self.save_dir,
                             save_name,
                             epoch_id + 1,
                             ema_model=student_model)
                         del teacher_model
                         del student_model
+                    del model_weight
                 else:
-                    save_model(weight, self.model.optimizer, os.path.join(self.save_dir, save_name) if self.uniform_output_enabled else self.save_dir,
-                               save_name, epoch_id + 1)
+                    self._save_async(save_model, weight, optimizer_state, save_root,
+                                     save_name, epoch_id + 1)
                     if self.uniform_output_enabled:
-                        self.model.export(output_dir=os.path.join(self.save_dir, save_name, "inference"), for_fd=True)
-                        gc.collect()
+                        self.model.export(output_dir=os.path.join(save_root, "inference"), for_fd=True)
+                        gc.collect(generation=0)
+                # the background save holds its own references
+                del weight, optimizer_state
+
+    def on_train_end(self, status):
+        # saves are decided and written by rank 0 alone, partly inside its
+        # evaluation which the other ranks skip, so no barrier can be put
+        # there. Every rank gets here, hold them until the last checkpoint
+        # is on disk, so that the end of the job implies it. A failed save
+        # is raised after the barrier, so the other ranks do not hang.
+        try:
+            self.wait_pending()
+        finally:
+            if self._world_size > 1:
+                dist.barrier()
 
 
 class WiferFaceEval(Callback):
@@ -331,12 +566,15 @@ class VisualDLWriter(Callback):
 
     def on_step_end(self, status):
         mode = status['mode']
-        if dist.get_world_size() < 2 or dist.get_rank() == 0:
+        if self._is_main:
             if mode == 'train':
-                training_staus = status['training_staus']
-                for loss_name, loss_value in training_staus.get().items():
-                    self.vdl_writer.add_scalar(loss_name, loss_value,
-                                               self.vdl_loss_step)
+                # write the losses on the steps LogPrinter logs, the step
+                # axis still counts every iteration
+                if status['step_id'] % self.model.cfg.log_iter == 0:
+                    training_staus = status['training_staus']
+                    for loss_name, loss_value in training_staus.get().items():
+                        self.vdl_writer.add_scalar(loss_name, loss_value,
+                                                   self.vdl_loss_step)
                 self.vdl_loss_step += 1
             elif mode == 'test':
                 ori_image = status['original_image']
@@ -355,17 +593,17 @@ class VisualDLWriter(Callback):
 
     def on_epoch_end(self, status):
         mode = status['mode']
-        if dist.get_world_size() < 2 or dist.get_rank() == 0:
+        if self._is_main:
             if mode == 'eval':
                 for metric in self.model._metrics:
-                    res = metric.get_results()
+                    res = _metric_results(status, metric)
                     if "MOTA" in res:
-                        mota = float(res.split(' ')[-9].rstrip("%")) / 100
+                        mota = _get_mota(metric, res)
                         self.vdl_writer.add_scalar("mot-mota",
                                                     mota,
                                                     self.vdl_mAP_step)
                     else:
-                        for key, map_value in metric.get_results().items():
+                        for key, map_value in res.items():
                             self.vdl_writer.add_scalar("{}-mAP".format(key),
                                                     map_value[0],
                                                     self.vdl_mAP_step)
@@ -393,14 +631,22 @@ class WandbCallback(Callback):
                 self.wandb_params.update({k.lstrip("wandb_"): v})
 
         self._run = None
-        if dist.get_world_size() < 2 or dist.get_rank() == 0:
+        if self._is_main:
             _ = self.run
             self.run.config.update(self.model.cfg)
             self.run.define_metric("epoch")
             self.run.define_metric("eval/*", step_metric="epoch")
+            # train metrics are only logged every log_iter steps, plot them
+            # against the training iteration instead of the wandb step
+            self.run.define_metric("train/step")
+            self.run.define_metric("train/*", step_metric="train/step")
 
         self.best_ap = -1000.
         self.fps = []
+        self._batch_size = _reader_batch_sizes(self.model.cfg)
+        # meter name -> logged key, the names are the same every step
+        self._train_key_cache = {}
+        self._eval_key_cache = {}
 
     @property
     def run(self):
@@ -424,7 +670,11 @@ class WandbCallback(Callback):
                    ap=None,
                    fps=None,
                    tags=None):
-        if dist.get_world_size() < 2 or dist.get_rank() == 0:
+        if self._is_main:
+            # the checkpoint files may still be written in background
+            for c in self.model._callbacks:
+                if isinstance(c, Checkpointer):
+                    c.wait_pending()
             model_path = os.path.join(save_dir, save_name)
             metadata = {}
             metadata["last_epoch"] = last_epoch
@@ -460,27 +710,33 @@ class WandbCallback(Callback):
     def on_step_end(self, status):
 
         mode = status['mode']
-        if dist.get_world_size() < 2 or dist.get_rank() == 0:
+        if self._is_main:
             if mode == 'train':
+                # log at the same rate as LogPrinter
+                if status['step_id'] % self.model.cfg.log_iter != 0:
+                    return
                 training_status = status['training_staus'].get()
-                for k, v in training_status.items():
-                    training_status[k] = float(v)
 
                 # calculate ips, data_cost, batch_cost
                 batch_time = status['batch_time']
                 data_time = status['data_time']
-                batch_size = self.model.cfg['{}Reader'.format(mode.capitalize(
-                ))]['batch_size']
+                batch_size = self._batch_size[mode]
 
                 ips = float(batch_size) / float(batch_time.avg)
                 data_cost = float(data_time.avg)
                 batch_cost = float(batch_time.avg)
 
-                metrics = {"train/" + k: v for k, v in training_status.items()}
+                keys = self._train_key_cache
+                for k in training_status:
+                    if k not in keys:
+                        keys[k] = "train/" + k
+                metrics = {keys[k]: float(v) for k, v in training_status.items()}
 
                 metrics["train/ips"] = ips
                 metrics["train/data_cost"] = data_cost
                 metrics["train/batch_cost"] = batch_cost
+                metrics["train/step"] = status['epoch_id'] * status[
+                    'steps_per_epoch'] + status['step_id']
 
                 self.fps.append(ips)
                 self.run.log(metrics)
@@ -489,7 +745,7 @@ class WandbCallback(Callback):
         mode = status['mode']
         epoch_id = status['epoch_id']
         save_name = None
-        if dist.get_world_size() < 2 or dist.get_rank() == 0:
+        if self._is_main:
             if mode == 'train':
                 fps = sum(self.fps) / len(self.fps)
                 self.fps = []
@@ -515,18 +771,24 @@ class WandbCallback(Callback):
 
                 fps = sample_num / cost_time
 
+                results_list = [
+                    _metric_results(status, metric)
+                    for metric in self.model._metrics
+                ]
+                keys = self._eval_key_cache
                 merged_dict = {}
-                for metric in self.model._metrics:
-                    for key, map_value in metric.get_results().items():
-                        merged_dict["eval/{}-mAP".format(key)] = map_value[0]
+                for map_res in results_list:
+                    for key, map_value in map_res.items():
+                        if key not in keys:
+                            keys[key] = "eval/{}-mAP".format(key)
+                        merged_dict[keys[key]] = map_value[0]
                 merged_dict["epoch"] = status["epoch_id"]
                 merged_dict["eval/fps"] = sample_num / cost_time
 
                 self.run.log(merged_dict)
 
                 if 'save_best_model' in status and status['save_best_model']:
-                    for metric in self.model._metrics:
-                        map_res = metric.get_results()
+                    for map_res in results_list:
                         if 'pose3d' in map_res:
                             key = 'pose3d'
                         elif 'bbox' in map_res:
@@ -588,9 +850,22 @@ class SniperProposalsGenerator(Callback):
                 outs = self.infer_model(data)
                 for key in ['im_shape', 'scale_factor', 'im_id']:
                     outs[key] = data[key]
-                for key, value in outs.items():
-                    if hasattr(value, 'numpy'):
-                        outs[key] = value.numpy()
+                tensor_keys = [
+                    key for key, value in outs.items()
+                    if isinstance(value, paddle.Tensor)
+                ]
+                gpu_keys = [
+                    key for key in tensor_keys
+                    if outs[key].place.is_gpu_place()
+                ]
+                if gpu_keys:
+                    # queue all device to host copies and wait for them once
+                    # instead of one implicit sync per .numpy() call
+                    for key in gpu_keys:
+                        outs[key] = outs[key].pin_memory(blocking=False)
+                    paddle.device.synchronize()
+                for key in tensor_keys:
+                    outs[key] = outs[key].numpy()
 
                 results.append(outs)
 
@@ -601,21 +876,29 @@ class SniperProposalsGenerator(Callback):
         results = self._eval_with_loader(self.loader)
         results = self.dataset.anno_cropper.aggregate_chips_detections(results)
         # sniper
-        proposals = []
+        try:
+            import orjson
+            dumps = lambda rec: orjson.dumps(
+                rec, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+        except ImportError:
+            dumps = json.dumps
         clsid2catid = {v: k for k, v in self.dataset.catid2clsid.items()}
-        for outs in results:
-            batch_res = get_infer_results(outs, clsid2catid)
-            start = 0
-            for i, im_id in enumerate(outs['im_id']):
-                bbox_num = outs['bbox_num']
-                end = start + bbox_num[i]
-                bbox_res = batch_res['bbox'][start:end] \
-                    if 'bbox' in batch_res else None
-                if bbox_res:
-                    proposals += bbox_res
         logger.info("save proposals in {}".format(self.cfg.proposals_path))
+        # stream the proposals into the json array batch by batch instead
+        # of holding all of them in memory
         with open(self.cfg.proposals_path, 'w') as f:
-            json.dump(proposals, f)
+            f.write('[')
+            sep = ''
+            for i in range(len(results)):
+                outs, results[i] = results[i], None
+                batch_res = get_infer_results(outs, clsid2catid)
+                # the per-image slices of the batch are consecutive and
+                # cover all its boxes, so take the whole batch at once
+                for rec in batch_res.get('bbox', []):
+                    f.write(sep)
+                    f.write(dumps(rec))
+                    sep = ', '
+            f.write(']')
 
 
 class SemiLogPrinter(LogPrinter):
@@ -623,11 +906,14 @@ class SemiLogPrinter(LogPrinter):
         super(SemiLogPrinter, self).__init__(model)
 
     def on_step_end(self, status):
-        if dist.get_world_size() < 2 or dist.get_rank() == 0:
+        if self._is_main:
             mode = status['mode']
             if mode == 'train':
-                epoch_id = status['epoch_id']
                 step_id = status['step_id']
+                # build the log line only on logging steps
+                if step_id % self.model.cfg.log_iter != 0:
+                    return
+                epoch_id = status['epoch_id']
                 iter_id = status['iter_id']
                 steps_per_epoch = status['steps_per_epoch']
                 training_staus = status['training_staus']
@@ -635,18 +921,17 @@ class SemiLogPrinter(LogPrinter):
                 data_time = status['data_time']
 
                 epoches = self.model.cfg.epoch
-                batch_size = self.model.cfg['{}Reader'.format(mode.capitalize(
-                ))]['batch_size']
+                batch_size = self._batch_size[mode]
                 iters = epoches * steps_per_epoch
                 logs = training_staus.log()
-                iter_space_fmt = ':' + str(len(str(iters))) + 'd'
-                space_fmt = ':' + str(len(str(iters))) + 'd'
-                if step_id % self.model.cfg.log_iter == 0:
-                    eta_steps = (epoches - epoch_id) * steps_per_epoch - step_id
-                    eta_sec = eta_steps * batch_time.global_avg
-                    eta_str = str(datetime.timedelta(seconds=int(eta_sec)))
-                    ips = float(batch_size) / batch_time.avg
-                    fmt = ' '.join([
+                eta_steps = (epoches - epoch_id) * steps_per_epoch - step_id
+                eta_sec = eta_steps * batch_time.global_avg
+                eta_str = str(datetime.timedelta(seconds=int(eta_sec)))
+                ips = float(batch_size) / batch_time.avg
+                if self._train_fmt_key != (steps_per_epoch, iters):
+                    iter_space_fmt = ':' + str(len(str(iters))) + 'd'
+                    space_fmt = ':' + str(len(str(iters))) + 'd'
+                    self._train_fmt = ' '.join([
                         '{' + iter_space_fmt + '}/{} iters',
                         'Epoch: [{}]',
                         '[{' + space_fmt + '}/{}]',
@@ -657,19 +942,20 @@ class SemiLogPrinter(LogPrinter):
                         'data_cost: {dtime}',
                         'ips: {ips:.4f} images/s',
                     ])
-                    fmt = fmt.format(
-                        iter_id,
-                        iters,
-                        epoch_id,
-                        step_id,
-                        steps_per_epoch,
-                        lr=status['learning_rate'],
-                        meters=logs,
-                        eta=eta_str,
-                        btime=str(batch_time),
-                        dtime=str(data_time),
-                        ips=ips)
-                    logger.info(fmt)
+                    self._train_fmt_key = (steps_per_epoch, iters)
+                fmt = self._train_fmt.format(
+                    iter_id,
+                    iters,
+                    epoch_id,
+                    step_id,
+                    steps_per_epoch,
+                    lr=status['learning_rate'],
+                    meters=logs,
+                    eta=eta_str,
+                    btime=str(batch_time),
+                    dtime=str(data_time),
+                    ips=ips)
+                logger.info(fmt)
             if mode == 'eval':
                 step_id = status['step_id']
                 if step_id % 100 == 0:
@@ -693,6 +979,44 @@ class SemiCheckpointer(Checkpointer):
         else:
             raise AttributeError(
                 "model has no attribute 'student' and 'teacher'")
+        # metric -> key of its AP in get_results(). The trainer may rebuild
+        # its metrics once validation starts, so resolve them lazily.
+        self._metric_keys = weakref.WeakKeyDictionary()
+        # index in self.weight -> _SavePlan of that model
+        self._save_plans = {}
+        # best models are not tracked before this epoch, e.g. during warmup
+        self.min_eval_epoch = cfg.get('min_eval_epoch', 0)
+
+    def _host_state_dict(self, index):
+        """
+        Host copy of the state_dict of self.weight[index]. The teacher and
+        student topology is fixed for the run, so the host tensors made on
+        the first save are refilled in place by the later ones.
+        """
+        state_dict = self.weight[index].state_dict()
+        plan = self._save_plans.get(index)
+        if plan is None or plan.names != list(state_dict.keys()):
+            # owned by the plan, never given back to the staging pool
+            buffers = self._staging.stage(state_dict)
+            self._save_plans[index] = _SavePlan(list(buffers.keys()), buffers)
+            return buffers
+        # the buffers may still be read by the previous background save
+        self.wait_pending()
+        return self._staging.refill(plan.buffers, state_dict)
+
+    def _metric_key(self, metric, map_res):
+        key = self._metric_keys.get(metric)
+        if key is None:
+            if 'bbox' in map_res:
+                key = 'bbox'
+            elif 'keypoint' in map_res:
+                key = 'keypoint'
+            else:
+                key = 'mask'
+            # do not remember a guess made from empty results
+            if key in map_res:
+                self._metric_keys[metric] = key
+        return key
 
     def every_n_iters(self, iter_id, n):
         return (iter_id + 1) % n == 0 if n > 0 else False
@@ -707,7 +1031,7 @@ class SemiCheckpointer(Checkpointer):
         t_weight = None
         s_weight = None
         save_name = None
-        if dist.get_world_size() < 2 or dist.get_rank() == 0:
+        if self._is_main:
             if self.every_n_iters(iter_id, save_interval) and mode == 'train':
                 save_name = "last_epoch"
                 # save_name = str(iter_id + 1)
@@ -718,39 +1042,43 @@ class SemiCheckpointer(Checkpointer):
                                 iter_id + 1)
 
     def on_epoch_end(self, status):
-        # Checkpointer only performed during training
-        mode = status['mode']
-        eval_interval = status['eval_interval']
-        save_interval = status['save_interval']
+        # only the best model is saved here, check the cheap conditions
+        # before scoring the metrics
+        if not status.get('save_best_model', False):
+            return
+        if status['mode'] != 'eval' or not self._is_main:
+            return
         iter_id = status['iter_id']
         epoch_id = status['epoch_id']
-        t_weight = None
-        s_weight = None
-        save_name = None
-        if dist.get_world_size() < 2 or dist.get_rank() == 0:
-            if self.every_n_iters(iter_id, eval_interval) and mode == 'eval':
-                if 'save_best_model' in status and status['save_best_model']:
-                    for metric in self.model._metrics:
-                        map_res = metric.get_results()
-                        if 'bbox' in map_res:
-                            key = 'bbox'
-                        elif 'keypoint' in map_res:
-                            key = 'keypoint'
-                        else:
-                            key = 'mask'
-                        if key not in map_res:
-                            logger.warning("Evaluation results empty, this may be due to " \
-                                        "training iterations being too few or not " \
-                                        "loading the correct weights.")
-                            return
-                        if map_res[key][0] > self.best_ap:
-                            self.best_ap = map_res[key][0]
-                            save_name = 'best_model'
-                            t_weight = self.weight[0].state_dict()
-                            s_weight = self.weight[1].state_dict()
-                        logger.info("Best teacher test {} ap is {:0.3f}.".
-                                    format(key, self.best_ap))
-                    if t_weight and s_weight:
-                        save_semi_model(t_weight, s_weight,
-                                        self.model.optimizer, self.save_dir,
-                                        save_name, epoch_id + 1, iter_id + 1)
+        if epoch_id < self.min_eval_epoch:
+            return
+        if not self.every_n_iters(iter_id, status['eval_interval']):
+            return
+        new_best = False
+        key = None
+        for metric in self.model._metrics:
+            map_res = _metric_results(status, metric)
+            key = self._metric_key(metric, map_res)
+            res = map_res.get(key)
+            if res is None:
+                logger.warning("Evaluation results empty, this may be due to " \
+                            "training iterations being too few or not " \
+                            "loading the correct weights.")
+                return
+            if res[0] > self.best_ap:
+                self.best_ap = res[0]
+                new_best = True
+        # best_ap is shared by all metrics, report it once
+        if key is not None:
+            logger.info("Best teacher test %s ap is %.3f.", key, self.best_ap)
+        # walk the weights once, and only when they are saved
+        if new_best:
+            save_name = 'best_model'
+            # stage host copies on the main thread and let the
+            # background worker write them while training goes on
+            t_weight = self._host_state_dict(0)
+            s_weight = self._host_state_dict(1)
+            self._save_async(
+                save_semi_model, t_weight, s_weight,
+                self._stage(self.model.optimizer.state_dict()),
+                self.save_dir, save_name, epoch_id + 1, iter_id + 1)
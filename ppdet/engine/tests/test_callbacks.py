@@ -0,0 +1,191 @@
+#   Copyright (c) 2024 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+import paddle
+
+from ppdet.core.workspace import AttrDict
+from ppdet.engine.callbacks import Checkpointer
+
+
+class _Metric(object):
+    def __init__(self, ap):
+        self.ap = ap
+
+    def get_results(self):
+        return {'bbox': [self.ap]}
+
+
+class _Trainer(object):
+    """
+    The parts of Trainer that Checkpointer reads.
+    """
+
+    def __init__(self, save_dir, use_ema=False):
+        self.cfg = AttrDict(save_dir=save_dir, epoch=2, snapshot_epoch=1)
+        self.model = paddle.nn.Sequential(
+            paddle.nn.Linear(4, 8), paddle.nn.BatchNorm1D(8))
+        self.optimizer = paddle.optimizer.Momentum(
+            learning_rate=0.1, parameters=self.model.parameters())
+        self.use_ema = use_ema
+        self._metrics = []
+        self._callbacks = []
+        # one step, so that the optimizer has states to save
+        loss = self.model(paddle.rand([2, 4])).mean()
+        loss.backward()
+        self.optimizer.step()
+        self.optimizer.clear_grad()
+
+
+class TestCheckpointer(unittest.TestCase):
+    def setUp(self):
+        self.save_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.save_dir)
+
+    def _path(self, name):
+        return os.path.join(self.save_dir, name)
+
+    def _build(self, use_ema=False):
+        self.trainer = _Trainer(self.save_dir, use_ema=use_ema)
+        self.checkpointer = Checkpointer(self.trainer)
+        self._release = threading.Event()
+        # hold the background writer, so that training can change the
+        # weights before the save runs
+        self.checkpointer._io_pool.submit(self._release.wait)
+
+    def _numpy(self, state_dict):
+        return {k: v.numpy() for k, v in state_dict.items()}
+
+    def _assert_saved(self, path, expected):
+        saved = paddle.load(path)
+        for key, value in expected.items():
+            np.testing.assert_array_equal(saved[key].numpy(), value)
+
+    def test_snapshot(self):
+        self._build()
+        model = self.trainer.model
+        expected = self._numpy(model.state_dict())
+        self.checkpointer.on_epoch_end({'mode': 'train', 'epoch_id': 0})
+        for param in model.parameters():
+            param.set_value(paddle.zeros_like(param))
+        self._release.set()
+        self.checkpointer.on_train_end({})
+
+        self.assertIsNone(self.checkpointer._pending)
+        self._assert_saved(self._path('0.pdparams'), expected)
+        self.assertEqual(
+            paddle.load(self._path('0.pdopt'))['last_epoch'], 1)
+
+    def test_name_table(self):
+        self._build()
+        state_dict = self.trainer.model.state_dict()
+        paddle.save(state_dict, self._path('live.pdparams'))
+        self._release.set()
+        self.checkpointer.on_epoch_end({'mode': 'train', 'epoch_id': 0})
+        self.checkpointer.on_train_end({})
+
+        live = paddle.load(self._path('live.pdparams'), keep_name_table=True)
+        saved = paddle.load(self._path('0.pdparams'), keep_name_table=True)
+        self.assertEqual(saved['StructuredToParameterName@@'],
+                         live['StructuredToParameterName@@'])
+
+    def test_ema(self):
+        self._build(use_ema=True)
+        ema = self._numpy(self.trainer.model.state_dict())
+        # the trainer's copy of the non-EMA weights
+        weight = {
+            k: paddle.full_like(v, 1.)
+            for k, v in self.trainer.model.state_dict().items()
+        }
+        expected = self._numpy(weight)
+        self.checkpointer.on_epoch_end({
+            'mode': 'train',
+            'epoch_id': 0,
+            'weight': weight
+        })
+        for value in weight.values():
+            value.set_value(paddle.zeros_like(value))
+        self._release.set()
+        self.checkpointer.on_train_end({})
+
+        self._assert_saved(self._path('0.pdparams'), ema)
+        self._assert_saved(self._path('0.pdema'), expected)
+
+    def test_pdstates(self):
+        self._build()
+        self._release.set()
+        metric = _Metric(0.5)
+        self.trainer._metrics = [metric]
+        expected = self._numpy(self.trainer.model.state_dict())
+        self.checkpointer.on_epoch_end({
+            'mode': 'eval',
+            'epoch_id': 0,
+            'save_best_model': True
+        })
+        metric.ap = 0.3
+        self.checkpointer.on_epoch_end({
+            'mode': 'eval',
+            'epoch_id': 1,
+            'save_best_model': True
+        })
+        self.checkpointer.on_train_end({})
+
+        self.assertEqual(
+            paddle.load(self._path('0.pdstates')), {'metric': 0.5,
+                                                    'epoch': 1})
+        self.assertEqual(
+            paddle.load(self._path('model_final.pdstates')),
+            {'metric': 0.3,
+             'epoch': 2})
+        self.assertEqual(
+            paddle.load(self._path('best_model.pdstates')),
+            {'metric': 0.5,
+             'epoch': 1})
+        self._assert_saved(self._path('best_model.pdparams'), expected)
+
+
+    def test_pdstates_metrics(self):
+        self._build()
+        self._release.set()
+        self.trainer._metrics = [_Metric(0.5), _Metric(0.4)]
+        self.checkpointer.on_epoch_end({
+            'mode': 'eval',
+            'epoch_id': 0,
+            'save_best_model': True
+        })
+        self.checkpointer.on_train_end({})
+
+        # the epoch states are written once, from the first metric
+        self.assertEqual(
+            paddle.load(self._path('0.pdstates')), {'metric': 0.5,
+                                                    'epoch': 1})
+        self.assertEqual(
+            paddle.load(self._path('best_model.pdstates')),
+            {'metric': 0.5,
+             'epoch': 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -694,7 +694,7 @@ class Trainer_ARSL(Trainer):
                 )
                 self._update_teacher_model(keep_rate=0.00)
                 # save burn-in model
-                if dist.get_world_size() < 2 or dist.get_rank() == 0:
+                if self._nranks < 2 or self._local_rank == 0:
                     print('saving burn-in model.')
                     save_name = 'burnIn'
                     epoch_id = self.iter // self.epoch_iter
@@ -233,6 +233,7 @@ class MOTMetric(Metric):
     def reset(self):
         self.accs = []
         self.seqs = []
+        self.mota = None
 
     def update(self, data_root, seq, data_type, result_root, result_filename):
         evaluator = self.MOTEvaluator(data_root, seq, data_type)
@@ -244,6 +245,8 @@ class MOTMetric(Metric):
         metrics = mm.metrics.motchallenge_metrics
         mh = mm.metrics.create()
         summary = self.MOTEvaluator.get_summary(self.accs, self.seqs, metrics)
+        # overall MOTA in [0, 1], so callers need not parse strsummary
+        self.mota = float(summary.loc['OVERALL', 'mota'])
         self.strsummary = mm.io.render_summary(
             summary,
             formatters=mh.formatters,
@@ -17,8 +17,11 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import io
 import os
 import json
+import collections
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import paddle
 import paddle.nn as nn
@@ -303,6 +306,49 @@ def load_pretrain_weight(model, pretrain_weight, ARSL_eval=False):
         logger.info('Finish loading model weights: {}'.format(weights_path))
 
 
+def _write_file(path, data):
+    dirname = os.path.dirname(path)
+    if dirname:
+        # may race with the trainer creating the same directory
+        os.makedirs(dirname, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+        f.flush()
+
+
+def _write_buffer(buf, paths):
+    data = buf.getbuffer()
+    for path in paths:
+        _write_file(path, data)
+    del data
+    buf.close()
+
+
+def _save_all(items):
+    """
+    Save a list of (obj, path) pairs. Every object is serialized with
+    paddle.save into memory once, even if it goes to several paths, and
+    written with one large write per file. The write of one object
+    overlaps the serialization of the next, and at most two serialized
+    objects are held at a time.
+    """
+    paths = collections.OrderedDict()
+    objs = {}
+    for obj, path in items:
+        paths.setdefault(id(obj), []).append(path)
+        objs[id(obj)] = obj
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        pending = None
+        for key, obj_paths in paths.items():
+            buf = io.BytesIO()
+            paddle.save(objs[key], buf)
+            if pending is not None:
+                pending.result()
+            pending = writer.submit(_write_buffer, buf, obj_paths)
+        if pending is not None:
+            pending.result()
+
+
 def save_model(model,
                optimizer,
                save_dir,
@@ -314,8 +360,8 @@ def save_model(model,
 
     Args:
         model (dict): the model state_dict to save parameters.
-        optimizer (paddle.optimizer.Optimizer): the Optimizer instance to
-            save optimizer states.
+        optimizer (paddle.optimizer.Optimizer|dict): the Optimizer instance
+            or a snapshot of its state_dict to save optimizer states.
         save_dir (str): the directory to be saved.
         save_name (str): the path to be saved.
         last_epoch (int): the epoch index.
@@ -324,42 +370,47 @@ def save_model(model,
     if paddle.distributed.get_rank() != 0:
         return
 
+    # saves may run in background while the trainer exports into the
+    # same directory, so tolerate it being created meanwhile
     save_dir = os.path.normpath(save_dir)
-    if not os.path.exists(save_dir):
-        os.makedirs(save_dir)
+    os.makedirs(save_dir, exist_ok=True)
 
     if save_name == "best_model":
         best_model_path = os.path.join(save_dir, 'best_model')
-        if not os.path.exists(best_model_path):
-            os.makedirs(best_model_path)
+        os.makedirs(best_model_path, exist_ok=True)
 
     save_path = os.path.join(save_dir, save_name)
+    files = []
     # save model
     if isinstance(model, nn.Layer):
-        paddle.save(model.state_dict(), save_path + ".pdparams")
         best_model = model.state_dict()
+        files.append((best_model, save_path + ".pdparams"))
     else:
         assert isinstance(model,
                           dict), 'model is not a instance of nn.layer or dict'
         if ema_model is None:
-            paddle.save(model, save_path + ".pdparams")
+            files.append((model, save_path + ".pdparams"))
             best_model = model
         else:
             assert isinstance(ema_model,
                               dict), ("ema_model is not a instance of dict, "
                                       "please call model.state_dict() to get.")
             # Exchange model and ema_model to save
-            paddle.save(ema_model, save_path + ".pdparams")
-            paddle.save(model, save_path + ".pdema")
+            files.append((ema_model, save_path + ".pdparams"))
+            files.append((model, save_path + ".pdema"))
             best_model = ema_model
 
     if save_name == 'best_model':
         best_model_path = os.path.join(best_model_path, 'model')
-        paddle.save(best_model, best_model_path + ".pdparams")
+        files.append((best_model, best_model_path + ".pdparams"))
     # save optimizer
-    state_dict = optimizer.state_dict()
+    if isinstance(optimizer, dict):
+        state_dict = optimizer
+    else:
+        state_dict = optimizer.state_dict()
     state_dict['last_epoch'] = last_epoch
-    paddle.save(state_dict, save_path + ".pdopt")
+    files.append((state_dict, save_path + ".pdopt"))
+    _save_all(files)
     logger.info("Save checkpoint: {}".format(save_dir))
 
 
@@ -370,8 +421,8 @@ def save_semi_model(teacher_model, student_model, optimizer, save_dir,
     Args:
         teacher_model (dict): the teacher_model state_dict to save parameters.
         student_model (dict): the student_model state_dict to save parameters.
-        optimizer (paddle.optimizer.Optimizer): the Optimizer instance to
-            save optimizer states.
+        optimizer (paddle.optimizer.Optimizer|dict): the Optimizer instance
+            or a snapshot of its state_dict to save optimizer states.
         save_dir (str): the directory to be saved.
         save_name (str): the path to be saved.
         last_epoch (int): the epoch index.
@@ -385,18 +436,24 @@ def save_semi_model(teacher_model, student_model, optimizer, save_dir,
     assert isinstance(student_model, dict), (
         "student_model is not a instance of dict, "
         "please call student_model.state_dict() to get.")
-    if not os.path.exists(save_dir):
-        os.makedirs(save_dir)
+    # may run in background, tolerate the directory being created meanwhile
+    os.makedirs(save_dir, exist_ok=True)
     save_path = os.path.join(save_dir, save_name)
     # save model
-    paddle.save(teacher_model, save_path + str(last_epoch) + "epoch_t.pdparams")
-    paddle.save(student_model, save_path + str(last_epoch) + "epoch_s.pdparams")
+    files = [
+        (teacher_model, save_path + str(last_epoch) + "epoch_t.pdparams"),
+        (student_model, save_path + str(last_epoch) + "epoch_s.pdparams"),
+    ]
 
     # save optimizer
-    state_dict = optimizer.state_dict()
+    if isinstance(optimizer, dict):
+        state_dict = optimizer
+    else:
+        state_dict = optimizer.state_dict()
     state_dict['last_epoch'] = last_epoch
     state_dict['last_iter'] = last_iter
-    paddle.save(state_dict, save_path + str(last_epoch) + "epoch.pdopt")
+    files.append((state_dict, save_path + str(last_epoch) + "epoch.pdopt"))
+    _save_all(files)
     logger.info("Save checkpoint: {}".format(save_dir))
 
 def save_model_info(model_info, save_path, prefix):